@@ -0,0 +1,505 @@
+"""
+Local columnar archive of scanner history.
+
+Mirrors scanner_runs, scanner_results and scanner_eval from Supabase into a
+Parquet dataset so research and evaluation metrics read local columnar data
+instead of paging through the API:
+
+    archive/scanner_runs/date=YYYY-MM-DD/part-<id>.parquet
+    archive/scanner_results/date=YYYY-MM-DD/tier=LARGE/part-<id>.parquet
+    archive/scanner_eval/date=YYYY-MM-DD/tier=LARGE/part-<id>.parquet
+
+`date` is the UTC date of the run's asof_ts. Results and eval rows carry
+asof_ts so they can be filtered without a join.
+
+Sync is incremental from the last exported asof_ts. Results and eval rows
+are exported per run: any archived run without rows in one of those tables
+is re-checked until it is too old to still receive them. Runs are written
+last, so a sync that dies half-way is simply redone. Each batch is written
+two-phase (all temp files first, then renamed), so a run's rows land in
+every partition or in none. At the end of a sync, closed `date=` partitions
+are compacted into a single file each.
+"""
+import json
+import os
+from uuid import uuid4
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config import ARCHIVE_DIR, ARCHIVE_PAGE_SIZE, EVAL_LOOKBACK_DAYS, TIMEFRAME_HOURS, TOP_K
+
+TABLES = {
+    # table -> partition columns
+    "scanner_runs": ["date"],
+    "scanner_results": ["date", "tier"],
+    "scanner_eval": ["date", "tier"],
+}
+
+# Explicit dtypes so an all-null partition does not get a null-typed column
+COLUMN_DTYPES = {
+    "raw_alpha": "float64",
+    "scanner_score": "float64",
+    "adv": "float64",
+    "fwd_return": "float64",
+    "rank_long": "Int64",
+    "rank_short": "Int64",
+    "horizon_hours": "Int64",
+    "universe_size": "Int64",
+    "execution_time_ms": "Int64",
+}
+
+# Unit of completeness for per-run tables: each is inserted in one batch per key.
+# The evaluator writes one batch per (run_id, horizon_hours).
+COMPLETE_KEYS = {
+    "scanner_results": ["run_id"],
+    "scanner_eval": ["run_id", "horizon_hours"],
+}
+
+# Unique sort order for paging with range(); anything less can skip or repeat rows
+PAGE_ORDER = {
+    "scanner_results": ["run_id", "symbol"],
+    "scanner_eval": ["run_id", "horizon_hours", "symbol"],
+}
+
+RUN_ID_CHUNK = 100  # run_ids per IN (...) filter, keeps URLs short
+STATE_FILE = "_sync_state.json"
+COMPACTED_FILE = "part-compacted.parquet"
+
+
+def _fetch_all(make_query) -> list:
+    """
+    Page through a Supabase query.
+
+    Args:
+        make_query: Callable returning a fresh, ordered query builder
+                    (builders are mutable, so each page needs its own)
+
+    Returns:
+        List of row dicts
+    """
+    rows = []
+    start = 0
+    while True:
+        page = make_query().range(start, start + ARCHIVE_PAGE_SIZE - 1).execute().data
+        rows.extend(page)
+        if len(page) < ARCHIVE_PAGE_SIZE:
+            return rows
+        start += ARCHIVE_PAGE_SIZE
+
+
+def _fetch_by_run_ids(sb, table: str, run_ids: list, columns: str = "*") -> list:
+    """Fetch rows of a per-run table for the given run_ids, paged in PAGE_ORDER."""
+    def query(chunk):
+        q = sb.table(table).select(columns).in_("run_id", chunk)
+        for col in PAGE_ORDER[table]:
+            q = q.order(col)
+        return q
+
+    rows = []
+    for i in range(0, len(run_ids), RUN_ID_CHUNK):
+        chunk = run_ids[i:i + RUN_ID_CHUNK]
+        rows.extend(_fetch_all(lambda: query(chunk)))
+    return rows
+
+
+def _dataset(table: str, archive_dir: str = ARCHIVE_DIR):
+    """Open one archived table as a hive-partitioned dataset, or None if empty."""
+    path = os.path.join(archive_dir, table)
+    if not os.path.isdir(path):
+        return None
+
+    schema = pa.schema([(col, pa.string()) for col in TABLES[table]])
+    return ds.dataset(path, format="parquet", partitioning=ds.partitioning(schema, flavor="hive"))
+
+
+def _write_partitioned(df: pd.DataFrame, table: str, archive_dir: str = ARCHIVE_DIR) -> int:
+    """
+    Write one new Parquet file per partition. Partition columns live in the
+    path only, as in pyarrow's own hive layout. All files are written to
+    dot-prefixed temp names (ignored by dataset discovery) before any is
+    renamed into place.
+
+    Returns:
+        Number of files written
+    """
+    if df.empty:
+        return 0
+
+    df = df.copy()
+    df["asof_ts"] = pd.to_datetime(df["asof_ts"], utc=True)
+    df["date"] = df["asof_ts"].dt.strftime("%Y-%m-%d")
+    df = df.astype({col: dtype for col, dtype in COLUMN_DTYPES.items() if col in df.columns})
+
+    part_cols = TABLES[table]
+    name = f"part-{uuid4().hex[:12]}.parquet"
+    pending = []
+    for keys, part in df.groupby(part_cols, sort=True):
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        part_dir = os.path.join(
+            archive_dir, table, *[f"{col}={val}" for col, val in zip(part_cols, keys)]
+        )
+        os.makedirs(part_dir, exist_ok=True)
+
+        arrow = pa.Table.from_pandas(
+            part.drop(columns=part_cols).sort_values("asof_ts"),
+            preserve_index=False,
+        )
+        tmp = os.path.join(part_dir, f".{name}.tmp")
+        pq.write_table(arrow, tmp)
+        pending.append((tmp, os.path.join(part_dir, name)))
+
+    for tmp, path in pending:
+        os.replace(tmp, path)
+
+    return len(pending)
+
+
+def _read_state(archive_dir: str = ARCHIVE_DIR) -> dict:
+    try:
+        with open(os.path.join(archive_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_state(state: dict, archive_dir: str = ARCHIVE_DIR) -> None:
+    path = os.path.join(archive_dir, STATE_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def last_exported_asof(archive_dir: str = ARCHIVE_DIR):
+    """Return the newest archived asof_ts (the sync watermark), or None."""
+    dataset = _dataset("scanner_runs", archive_dir)
+    if dataset is None:
+        return None
+
+    asof = dataset.to_table(columns=["asof_ts"]).column("asof_ts")
+    if len(asof) == 0:
+        return None
+    return pd.Timestamp(pc.max(asof).as_py())
+
+
+def sync_archive(sb=None, archive_dir: str = ARCHIVE_DIR) -> dict:
+    """
+    Incrementally mirror the Supabase tables into the local archive.
+
+    New runs (asof_ts >= watermark, not already archived) are exported.
+    Results and eval rows are then exported for every run that has none
+    archived yet: eval rows arrive hours after the run, and a sync can land
+    between the scanner's scanner_runs and scanner_results inserts.
+
+    Args:
+        sb: Supabase client (created from the environment if omitted)
+        archive_dir: Archive root directory
+
+    Returns:
+        Dict with counts of exported rows per table and compacted partitions
+    """
+    if sb is None:
+        from scanner import get_supabase_client
+        sb = get_supabase_client()
+
+    started_at = pd.Timestamp.now(tz="UTC")
+    os.makedirs(archive_dir, exist_ok=True)
+
+    # The evaluator only scores runs younger than EVAL_LOOKBACK_DAYS, so a run
+    # that was already that old at the previous sync can no longer gain rows.
+    last_sync = _read_state(archive_dir).get("last_sync")
+    cutoff = pd.Timestamp(last_sync) - pd.Timedelta(days=EVAL_LOOKBACK_DAYS) if last_sync else None
+
+    watermark = last_exported_asof(archive_dir)
+    print(f"Archive watermark: {watermark}, re-check cutoff: {cutoff}")
+
+    # gte, not gt: a manual re-run of the watermark bar lands on the same asof_ts
+    def runs_query():
+        q = sb.table("scanner_runs").select("*")
+        if watermark is not None:
+            q = q.gte("asof_ts", watermark.isoformat())
+        return q.order("asof_ts").order("run_id")
+
+    runs = pd.DataFrame(_fetch_all(runs_query))
+    if watermark is not None and not runs.empty:
+        known = _dataset("scanner_runs", archive_dir).to_table(
+            columns=["run_id"],
+            filter=ds.field("asof_ts") == watermark,
+        ).column("run_id").to_pylist()
+        runs = runs[~runs["run_id"].isin(set(known))].reset_index(drop=True)
+    print(f"New runs: {len(runs)}")
+
+    # 1. Per-run tables for new runs and archived runs still missing rows
+    n_results = _sync_per_run(sb, "scanner_results", runs, cutoff, archive_dir)
+    n_eval = _sync_per_run(sb, "scanner_eval", runs, cutoff, archive_dir)
+
+    # 2. Runs last: this advances the watermark
+    _write_partitioned(runs, "scanner_runs", archive_dir)
+
+    # 3. Merge the small per-sync files of closed days
+    n_compacted = compact_archive(archive_dir)
+
+    _write_state({"last_sync": started_at.isoformat()}, archive_dir)
+
+    summary = {
+        "scanner_runs": len(runs),
+        "scanner_results": n_results,
+        "scanner_eval": n_eval,
+        "compacted_partitions": n_compacted,
+    }
+    print(f"✅ Archive synced: {summary}")
+    return summary
+
+
+def _sync_per_run(sb, table: str, new_runs: pd.DataFrame, cutoff, archive_dir: str = ARCHIVE_DIR) -> int:
+    """
+    Export rows of a per-run table (scanner_results / scanner_eval) for new
+    runs and for archived runs at or after `cutoff` that are missing rows.
+
+    Rows are inserted in one batch per COMPLETE_KEYS key, so an archived row
+    means that key is complete. For scanner_results the key is the run, so
+    runs with any archived row are skipped. For scanner_eval a run can gain
+    new horizons later: the remote (run_id, horizon_hours) keys are listed
+    first (a narrow projection) and only missing keys are exported.
+
+    Returns:
+        Number of rows exported
+    """
+    candidates = []
+    runs_ds = _dataset("scanner_runs", archive_dir)
+    if runs_ds is not None:
+        archived = runs_ds.to_table(
+            columns=["run_id", "asof_ts"],
+            filter=ds.field("date") >= cutoff.strftime("%Y-%m-%d") if cutoff is not None else None,
+        ).to_pandas()
+        candidates.append(archived)
+    if not new_runs.empty:
+        candidates.append(new_runs[["run_id", "asof_ts"]])
+    if not candidates:
+        return 0
+
+    candidates = pd.concat(candidates, ignore_index=True).drop_duplicates("run_id")
+    candidates["asof_ts"] = pd.to_datetime(candidates["asof_ts"], utc=True)
+    if cutoff is not None:
+        candidates = candidates[
+            (candidates["asof_ts"] >= cutoff) | candidates["run_id"].isin(set(new_runs.get("run_id", [])))
+        ]
+
+    if candidates.empty:
+        return 0
+
+    keys = COMPLETE_KEYS[table]
+    done = set()
+    table_ds = _dataset(table, archive_dir)
+    if table_ds is not None:
+        archived = table_ds.to_table(
+            columns=keys,
+            filter=ds.field("run_id").isin(candidates["run_id"].tolist()),
+        ).to_pandas()
+        done = set(archived[keys].itertuples(index=False, name=None))
+
+    if keys == ["run_id"]:
+        pending = candidates[~candidates["run_id"].isin({k[0] for k in done})]
+    else:
+        remote = pd.DataFrame(
+            _fetch_by_run_ids(sb, table, candidates["run_id"].tolist(), columns=",".join(keys))
+        )
+        if remote.empty:
+            return 0
+        missing = set(remote[keys].itertuples(index=False, name=None)) - done
+        pending = candidates[candidates["run_id"].isin({k[0] for k in missing})]
+
+    if pending.empty:
+        return 0
+
+    rows = pd.DataFrame(_fetch_by_run_ids(sb, table, pending["run_id"].tolist()))
+    if rows.empty:
+        return 0
+
+    if done:
+        row_keys = pd.Series(list(rows[keys].itertuples(index=False, name=None)), index=rows.index)
+        rows = rows[~row_keys.isin(done)]
+    rows = rows.merge(pending, on="run_id", how="left")
+    _write_partitioned(rows, table, archive_dir)
+    return len(rows)
+
+
+def compact_archive(archive_dir: str = ARCHIVE_DIR) -> int:
+    """
+    Merge the files of every closed partition (date before today, UTC) into
+    a single part-compacted.parquet.
+
+    Returns:
+        Number of partitions compacted
+    """
+    today = pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%d")
+    n_compacted = 0
+
+    for table in TABLES:
+        root = os.path.join(archive_dir, table)
+        for part_dir, _, filenames in os.walk(root):
+            files = sorted(f for f in filenames if f.endswith(".parquet") and not f.startswith("."))
+            if not files:
+                continue
+
+            parts = os.path.relpath(part_dir, root).split(os.sep)
+            date = next((p.split("=", 1)[1] for p in parts if p.startswith("date=")), None)
+            if date is None or date >= today:
+                continue
+
+            if _compact_partition(part_dir, files):
+                n_compacted += 1
+
+    return n_compacted
+
+
+def _compact_partition(part_dir: str, files: list) -> bool:
+    """
+    Merge `files` into COMPACTED_FILE. The merged file records its inputs in
+    its schema metadata, so inputs left behind by an interrupted compaction
+    are deleted on the next pass instead of being read twice.
+    """
+    if files == [COMPACTED_FILE]:
+        return False
+
+    target = os.path.join(part_dir, COMPACTED_FILE)
+
+    if COMPACTED_FILE in files:
+        metadata = pq.read_schema(target).metadata or {}
+        merged_from = set(json.loads(metadata.get(b"compacted_from", b"[]")))
+        for name in [f for f in files if f in merged_from]:
+            os.remove(os.path.join(part_dir, name))
+        files = [f for f in files if f not in merged_from]
+
+    if len(files) <= 1:
+        return False
+
+    inputs = [f for f in files if f != COMPACTED_FILE]
+    merged = pa.concat_tables(
+        [pq.ParquetFile(os.path.join(part_dir, f)).read() for f in files],
+        promote_options="default",
+    ).sort_by("asof_ts")
+    merged = merged.replace_schema_metadata({
+        **(merged.schema.metadata or {}),
+        b"compacted_from": json.dumps(inputs).encode(),
+    })
+
+    tmp = os.path.join(part_dir, f".{COMPACTED_FILE}.tmp")
+    pq.write_table(merged, tmp)
+    os.replace(tmp, target)
+    for name in inputs:
+        os.remove(os.path.join(part_dir, name))
+    return True
+
+
+def load_history(
+    table: str,
+    columns: list = None,
+    start=None,
+    end=None,
+    tiers: list = None,
+    filter=None,
+    archive_dir: str = ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """
+    Scan archived history with column projection and predicate pushdown.
+
+    Date bounds and tiers prune whole partitions before any file is opened;
+    `filter` (a pyarrow.dataset expression, e.g. ds.field("rank_long") <= 10)
+    is pushed down to the Parquet row groups.
+
+    Args:
+        table: One of scanner_runs, scanner_results, scanner_eval
+        columns: Columns to read (None reads all, including partition columns)
+        start: Inclusive lower bound on asof_ts
+        end: Inclusive upper bound on asof_ts
+        tiers: Tiers to keep (results/eval only)
+        filter: Extra pyarrow.dataset expression
+        archive_dir: Archive root directory
+
+    Returns:
+        DataFrame of matching rows
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table: {table}")
+
+    dataset = _dataset(table, archive_dir)
+    if dataset is None:
+        return pd.DataFrame(columns=columns)
+
+    expr = None
+
+    def add(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if start is not None:
+        start = pd.Timestamp(start)
+        start = start.tz_localize("UTC") if start.tzinfo is None else start.tz_convert("UTC")
+        add(ds.field("date") >= start.strftime("%Y-%m-%d"))
+        add(ds.field("asof_ts") >= start)
+    if end is not None:
+        end = pd.Timestamp(end)
+        end = end.tz_localize("UTC") if end.tzinfo is None else end.tz_convert("UTC")
+        add(ds.field("date") <= end.strftime("%Y-%m-%d"))
+        add(ds.field("asof_ts") <= end)
+    if tiers is not None:
+        if "tier" not in TABLES[table]:
+            raise ValueError(f"{table} is not partitioned by tier")
+        add(ds.field("tier").isin(list(tiers)))
+    if filter is not None:
+        add(filter)
+
+    return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+
+def topk_performance(
+    start=None,
+    end=None,
+    k: int = TOP_K,
+    horizon_hours: int = TIMEFRAME_HOURS,
+    archive_dir: str = ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """
+    Mean forward return of the top-K LONG and SHORT candidates per run and tier.
+
+    Grouped by run_id as well as asof_ts: a manual re-run of a bar is a
+    separate run with the same asof_ts.
+
+    Args:
+        start, end: asof_ts bounds
+        k: Number of candidates per side
+        horizon_hours: Evaluation horizon to read
+        archive_dir: Archive root directory
+
+    Returns:
+        DataFrame indexed by (asof_ts, run_id, tier) with long_ret, short_ret, spread
+    """
+    df = load_history(
+        "scanner_eval",
+        columns=["asof_ts", "run_id", "tier", "fwd_return", "rank_long", "rank_short"],
+        start=start,
+        end=end,
+        filter=(ds.field("horizon_hours") == horizon_hours)
+        & ((ds.field("rank_long") <= k) | (ds.field("rank_short") <= k)),
+        archive_dir=archive_dir,
+    )
+
+    if df.empty:
+        return pd.DataFrame(columns=["long_ret", "short_ret", "spread"])
+
+    keys = ["asof_ts", "run_id", "tier"]
+    long_ret = df[df["rank_long"] <= k].groupby(keys)["fwd_return"].mean()
+    short_ret = df[df["rank_short"] <= k].groupby(keys)["fwd_return"].mean()
+
+    out = pd.DataFrame({"long_ret": long_ret, "short_ret": short_ret})
+    out["spread"] = out["long_ret"] - out["short_ret"]
+    return out.sort_index()
+
+
+if __name__ == "__main__":
+    sync_archive()
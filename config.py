@@ -19,7 +19,30 @@ INFERENCE_URL = os.getenv("INFERENCE_URL", "https://worker-production-b8c8.up.ra
 EXCHANGE = "toobit"
 SYMBOL_SUFFIX = "/USDT:USDT"
 OHLCV_LIMIT = 1000
+# Fail the run if a larger share of symbols cannot be fetched: liquidity tiers are
+# quantiles and z-scores use the cross-sectional median/MAD, so every missing
+# symbol shifts the rest. A few delisted or flaky symbols are tolerated; an
+# exchange outage is not. Set to 1 to only skip failed symbols.
+MAX_FETCH_FAILURE_RATE = float(os.getenv("MAX_FETCH_FAILURE_RATE", "0.05"))
 
 # Liquidity tier thresholds (quantiles)
 LARGE_TIER_THRESHOLD = 0.2
-MID_TIER_THRESHOLD = 0.6
\ No newline at end of file
+MID_TIER_THRESHOLD = 0.6
+
+# Snapshot cache (local read-through copy of each run)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_HOST = os.getenv("SNAPSHOT_HOST", "0.0.0.0")
+SNAPSHOT_PORT = int(os.getenv("SNAPSHOT_PORT", "8080"))
+SNAPSHOT_RETENTION = int(os.getenv("SNAPSHOT_RETENTION", "180"))  # files on disk (30 days of 4h bars)
+SNAPSHOT_CACHE_SIZE = 12  # snapshots held in server memory
+
+# Evaluation lookback: evaluate_scanner.py only scores runs younger than this,
+# and archive.py relies on it to stop re-checking runs for new eval rows
+EVAL_LOOKBACK_DAYS = 7
+
+# Columnar archive (local Parquet mirror of the Supabase tables)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_PAGE_SIZE = 1000  # Supabase caps responses at 1000 rows
+
+# Sharded execution (worker processes; 1 = single process)
+SCANNER_WORKERS = int(os.getenv("SCANNER_WORKERS", "1"))
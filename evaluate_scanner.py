@@ -11,6 +11,8 @@ import pandas as pd
 from datetime import datetime, timezone, timedelta
 from supabase import create_client
 
+from config import EVAL_LOOKBACK_DAYS
+
 # ============================================================
 # CONFIG (SINGLE SOURCE OF TRUTH)
 # ============================================================
@@ -82,7 +84,7 @@ def main():
     
     now = datetime.now(timezone.utc)
     eval_cutoff = now - timedelta(hours=HORIZON_H, minutes=SAFETY_MINUTES)
-    eval_start  = now - timedelta(days=7)
+    eval_start  = now - timedelta(days=EVAL_LOOKBACK_DAYS)
     
     print("=" * 72)
     print("SCANNER EVALUATION — FINAL (LEAK-FREE)")
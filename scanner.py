@@ -17,9 +17,10 @@ from supabase import create_client, Client
 from config import (
     TIMEFRAME_HOURS, TIMEFRAME, TOP_K, ADV_WINDOW,
     INFERENCE_URL, EXCHANGE, SYMBOL_SUFFIX, OHLCV_LIMIT,
-    LARGE_TIER_THRESHOLD, MID_TIER_THRESHOLD, SEED
+    LARGE_TIER_THRESHOLD, MID_TIER_THRESHOLD, SEED, SCANNER_WORKERS, MAX_FETCH_FAILURE_RATE
 )
 from features import build_features, get_inference_features, prepare_inference_payload
+from snapshot_cache import publish_snapshot
 
 
 def get_supabase_client() -> Client:
@@ -42,23 +43,54 @@ def last_closed_bar(hours: int) -> pd.Timestamp:
     return now.floor(f"{hours}h") - pd.Timedelta(hours=hours)
 
 
-def fetch_ohlcv_data(last_closed: pd.Timestamp) -> pd.DataFrame:
+def make_exchange(workers: int = 1):
+    """
+    Create the configured ccxt exchange client.
+    
+    Args:
+        workers: Number of processes sharing the exchange's rate limit; each
+                 client spaces its requests workers times further apart
+    """
+    ex = getattr(ccxt, EXCHANGE)({"enableRateLimit": True})
+    ex.rateLimit = ex.rateLimit * workers
+    return ex
+
+
+def list_symbols(ex) -> list:
+    """Return active */USDT:USDT perpetual symbols on the exchange."""
+    mkts = ex.load_markets()
+    
+    return [
+        s for s, m in mkts.items()
+        if s.endswith(SYMBOL_SUFFIX) and m.get("active", True)
+    ]
+
+
+def fetch_ohlcv_data(
+    last_closed: pd.Timestamp,
+    ex=None,
+    symbols: list = None,
+    progress: bool = True,
+    failed: list = None,
+) -> pd.DataFrame:
     """
     Fetch OHLCV data from exchange.
     
     Args:
         last_closed: Last closed bar timestamp
+        ex: Exchange client (make_exchange() if omitted)
+        symbols: Symbols to fetch (full universe if omitted)
+        progress: Show a progress bar
+        failed: If given, symbols whose fetch raised are appended to it
         
     Returns:
         DataFrame with columns [symbol, datetime, open, high, low, close, volume]
     """
-    ex = ccxt.toobit({"enableRateLimit": True})
-    mkts = ex.load_markets()
+    if ex is None:
+        ex = make_exchange()
     
-    symbols = [
-        s for s, m in mkts.items()
-        if s.endswith(SYMBOL_SUFFIX) and m.get("active", True)
-    ]
+    if symbols is None:
+        symbols = list_symbols(ex)
     
     print(f"Fetching {len(symbols)} symbols...")
     
@@ -69,7 +101,7 @@ def fetch_ohlcv_data(last_closed: pd.Timestamp) -> pd.DataFrame:
     
     all_data = []
     
-    for sym in tqdm(symbols, desc="Fetching OHLCV"):
+    for sym in tqdm(symbols, desc="Fetching OHLCV", disable=not progress):
         try:
             bars = ex.fetch_ohlcv(sym, TIMEFRAME, since=since_ts, limit=OHLCV_LIMIT)
             if not bars:
@@ -88,6 +120,8 @@ def fetch_ohlcv_data(last_closed: pd.Timestamp) -> pd.DataFrame:
                 
         except Exception as e:
             print(f"Error fetching {sym}: {e}")
+            if failed is not None:
+                failed.append(sym)
             continue
     
     if not all_data:
@@ -269,32 +303,20 @@ def save_to_supabase(ranked: pd.DataFrame, last_closed: pd.Timestamp, execution_
     return run_id
 
 
-def run_scanner() -> dict:
+def score_symbols(raw_data: pd.DataFrame, last_closed: pd.Timestamp, infer=call_inference_api) -> pd.DataFrame:
     """
-    Main scanner execution.
+    Build features and attach inference predictions for the last closed bar.
     
+    Args:
+        raw_data: OHLCV DataFrame from fetch_ohlcv_data
+        last_closed: Last closed bar timestamp
+        infer: Inference callable (payload -> list of {"raw_alpha": ...})
+        
     Returns:
-        Dict with scanner results
+        DataFrame with one row per symbol at last_closed and a raw_alpha
+        column (NaN where features are incomplete). Empty if no symbol has
+        a bar at last_closed.
     """
-    import time
-    start_time = time.time()
-    
-    # HARD STOP: Ensure we're running the fixed version
-    assert "SCANNER VERSION: 2025-12-19-FIXED-MASK" in open(__file__).read(), "WRONG SCANNER VERSION!"
-    
-    print("=" * 60)
-    print("REAL-TIME SCANNER SERVICE")
-    print("=" * 60)
-    
-    # 1. Determine last closed bar
-    last_closed = last_closed_bar(TIMEFRAME_HOURS)
-    print(f"\nLast closed bar: {last_closed}")
-    
-    # 2. Fetch OHLCV data
-    print("\nFetching OHLCV data...")
-    raw_data = fetch_ohlcv_data(last_closed)
-    print(f"Fetched {raw_data['symbol'].nunique()} symbols")
-    
     # 3. Build features per symbol
     print("\nBuilding features...")
     all_features = []
@@ -308,10 +330,10 @@ def run_scanner() -> dict:
     # 4. Prepare inference payload (only last closed bar with valid features)
     print("\nPreparing inference payload...")
     latest_features = feature_df[feature_df["datetime"] == last_closed].copy()
+    latest_features["raw_alpha"] = np.nan  # Initialize all as NaN
     
-    # Check data lag
     if latest_features.empty:
-        raise ValueError(f"No data available for last closed bar: {last_closed}")
+        return latest_features.reset_index(drop=True)
     
     # Create mask for rows with complete features
     features = get_inference_features()
@@ -325,16 +347,14 @@ def run_scanner() -> dict:
     print(f"Inference payload size: {len(payload['rows'])} rows")
     
     if not payload["rows"]:
-        raise ValueError("No valid features for inference")
+        return latest_features.sort_values("symbol").reset_index(drop=True)
     
     # 5. Call inference API
     print("\nCalling inference API...")
-    predictions = call_inference_api(payload)
+    predictions = infer(payload)
     print(f"Received {len(predictions)} predictions")
     
     # 6. Merge predictions back using mask
-    latest_features["raw_alpha"] = np.nan  # Initialize all as NaN
-    
     # Bulletproof validation
     assert len(predictions) == len(latest_valid), f"Prediction count mismatch: {len(predictions)} != {len(latest_valid)}"
     assert len(predictions) == valid_mask.sum(), f"Prediction vs mask mismatch: {len(predictions)} != {valid_mask.sum()}"
@@ -342,6 +362,74 @@ def run_scanner() -> dict:
     # Safe assignment using mask - FIXED VERSION 2025-12-19
     latest_features.loc[valid_mask, "raw_alpha"] = [p["raw_alpha"] for p in predictions]
     
+    # Fixed symbol order: liq_rank breaks ADV ties by position, so the
+    # cross-section must not depend on fetch order or sharding
+    return latest_features.sort_values("symbol").reset_index(drop=True)
+
+
+def check_fetch_failures(failed: list, n_symbols: int) -> None:
+    """
+    Fail the run if too many symbols could not be fetched.
+    Tiers and z-scores on a partial cross-section would be silently wrong.
+    """
+    if not failed:
+        return
+    
+    print(f"⚠️ {len(failed)}/{n_symbols} symbols failed to fetch")
+    if len(failed) > MAX_FETCH_FAILURE_RATE * n_symbols:
+        raise ValueError(
+            f"Too many fetch failures: {len(failed)}/{n_symbols} "
+            f"(max {MAX_FETCH_FAILURE_RATE:.0%})"
+        )
+
+
+def run_scanner(workers: int = SCANNER_WORKERS) -> dict:
+    """
+    Main scanner execution.
+    
+    Args:
+        workers: Number of worker processes; >1 splits the symbol universe
+                 into hash shards (see sharding.py)
+        
+    Returns:
+        Dict with scanner results
+    """
+    import time
+    start_time = time.time()
+    
+    # HARD STOP: Ensure we're running the fixed version
+    assert "SCANNER VERSION: 2025-12-19-FIXED-MASK" in open(__file__).read(), "WRONG SCANNER VERSION!"
+    
+    print("=" * 60)
+    print("REAL-TIME SCANNER SERVICE")
+    print("=" * 60)
+    
+    # 1. Determine last closed bar
+    last_closed = last_closed_bar(TIMEFRAME_HOURS)
+    print(f"\nLast closed bar: {last_closed}")
+    
+    # 2-6. Fetch, build features and infer (optionally sharded across workers)
+    if workers > 1:
+        from sharding import run_sharded
+        print(f"\nRunning sharded scan with {workers} workers...")
+        latest_features = run_sharded(last_closed, workers)
+    else:
+        print("\nFetching OHLCV data...")
+        ex = make_exchange()
+        symbols = list_symbols(ex)
+        failed = []
+        raw_data = fetch_ohlcv_data(last_closed, ex=ex, symbols=symbols, failed=failed)
+        print(f"Fetched {raw_data['symbol'].nunique()} symbols")
+        check_fetch_failures(failed, len(symbols))
+        latest_features = score_symbols(raw_data, last_closed)
+    
+    # Check data lag
+    if latest_features.empty:
+        raise ValueError(f"No data available for last closed bar: {last_closed}")
+    
+    if not latest_features["raw_alpha"].notna().any():
+        raise ValueError("No valid features for inference")
+    
     # 7. Cross-sectional ranking
     print("\nPerforming cross-sectional ranking...")
     ranked = rank_cross_sectional(latest_features, last_closed)
@@ -355,6 +443,12 @@ def run_scanner() -> dict:
     print(f"\nSaving to Supabase...")
     run_id = save_to_supabase(ranked, last_closed, execution_time_ms)
     
+    # 10. Publish local snapshot for low-latency readers (best-effort: the run is already saved)
+    try:
+        publish_snapshot(output, ranked, last_closed, run_id)
+    except Exception as e:
+        print(f"Snapshot publish failed: {e}")
+    
     # Print summary
     print("\n" + "=" * 60)
     print("SCANNER RESULTS")
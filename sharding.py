@@ -0,0 +1,145 @@
+"""
+Sharded scanner execution.
+
+The symbol universe is split into shards by a stable hash of the symbol.
+Each worker process fetches OHLCV, builds features and calls inference for
+its own shard and returns only the compact per-symbol rows at the last
+closed bar, plus the symbols it failed to fetch. The coordinator
+concatenates them; tiering and the MAD z-score (rank_cross_sectional)
+still run once on the full cross-section, so a failed shard, or too many
+failed symbols, fails the run. Workers split the exchange rate limit
+between them rather than each using the full budget.
+
+Shard assignment uses crc32, not hash(), so it is identical across
+processes and hosts regardless of PYTHONHASHSEED.
+"""
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+from scanner import (
+    call_inference_api, check_fetch_failures, fetch_ohlcv_data, list_symbols, make_exchange, score_symbols
+)
+
+# Everything rank_cross_sectional, generate_output and the writers need
+COMPACT_COLUMNS = ["symbol", "datetime", "adv", "raw_alpha"]
+
+
+def shard_of(symbol: str, n_shards: int) -> int:
+    """Return the shard index of a symbol."""
+    return zlib.crc32(symbol.encode()) % n_shards
+
+
+def partition_symbols(symbols: list, n_shards: int) -> list:
+    """Split symbols into n_shards lists by shard_of."""
+    shards = [[] for _ in range(n_shards)]
+    for sym in symbols:
+        shards[shard_of(sym, n_shards)].append(sym)
+    return shards
+
+
+def scan_shard(
+    symbols: list,
+    last_closed: pd.Timestamp,
+    exchange_factory=make_exchange,
+    infer=call_inference_api,
+) -> tuple:
+    """
+    Fetch, build features and infer for one shard.
+
+    Per-symbol fetch failures are returned rather than judged here, so the
+    coordinator applies check_fetch_failures to the whole universe. A shard
+    where every symbol failed or returned no bars therefore yields an empty
+    frame instead of raising, and the outcome does not depend on how many
+    workers the universe was split across. Any other error fails the shard.
+
+    Args:
+        symbols: Symbols in this shard
+        last_closed: Last closed bar timestamp
+        exchange_factory: Picklable callable returning an exchange client
+        infer: Picklable inference callable
+
+    Returns:
+        (DataFrame with COMPACT_COLUMNS, one row per symbol at last_closed,
+         list of symbols whose fetch failed)
+    """
+    ex = exchange_factory()
+    failed = []
+
+    try:
+        raw_data = fetch_ohlcv_data(last_closed, ex=ex, symbols=symbols, progress=False, failed=failed)
+    except ValueError:
+        # "No data fetched": nothing to score in this shard
+        return pd.DataFrame(columns=COMPACT_COLUMNS), failed
+
+    latest = score_symbols(raw_data, last_closed, infer=infer)
+    return latest[COMPACT_COLUMNS].reset_index(drop=True), failed
+
+
+def run_sharded(
+    last_closed: pd.Timestamp,
+    workers: int,
+    exchange_factory=None,
+    infer=call_inference_api,
+    symbols: list = None,
+) -> pd.DataFrame:
+    """
+    Run scan_shard across worker processes and merge the results.
+
+    The run fails if any shard raises or if too many symbols failed to fetch
+    (check_fetch_failures), since ranking needs the full cross-section.
+
+    Args:
+        last_closed: Last closed bar timestamp
+        workers: Number of shards / worker processes
+        exchange_factory: Picklable callable returning an exchange client;
+                          defaults to make_exchange with the exchange rate
+                          limit split across the shards
+        infer: Picklable inference callable
+        symbols: Universe to scan (listed from the exchange if omitted)
+
+    Returns:
+        Merged compact DataFrame for the full universe, ready for
+        rank_cross_sectional
+    """
+    if exchange_factory is None:
+        exchange_factory = partial(make_exchange, workers=workers)
+
+    if symbols is None:
+        symbols = list_symbols(exchange_factory())
+
+    shards = [s for s in partition_symbols(symbols, workers) if s]
+    print(f"Sharding {len(symbols)} symbols into {len(shards)} shards: {[len(s) for s in shards]}")
+
+    results = []
+    if len(shards) <= 1:
+        for i, shard in enumerate(shards):
+            results.append(_shard_result(i, lambda: scan_shard(shard, last_closed, exchange_factory, infer)))
+    else:
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [
+                pool.submit(scan_shard, s, last_closed, exchange_factory, infer)
+                for s in shards
+            ]
+            results = [_shard_result(i, f.result) for i, f in enumerate(futures)]
+
+    failed = [sym for _, shard_failed in results for sym in shard_failed]
+    check_fetch_failures(failed, len(symbols))
+
+    parts = [part for part, _ in results if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=COMPACT_COLUMNS)
+
+    # Same symbol order as the single-process path (score_symbols)
+    merged = pd.concat(parts, ignore_index=True)
+    return merged.sort_values("symbol").reset_index(drop=True)
+
+
+def _shard_result(index: int, get_result) -> tuple:
+    """Return a shard's result, naming the shard if it failed."""
+    try:
+        return get_result()
+    except Exception as e:
+        raise RuntimeError(f"Shard {index} failed: {e}") from e
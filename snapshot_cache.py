@@ -0,0 +1,392 @@
+"""
+Local snapshot cache for scanner output.
+
+Each run is written to SNAPSHOT_DIR as a versioned JSON file
+keyed by asof_ts, and `latest.json` is atomically swapped to point at it.
+Only the SNAPSHOT_RETENTION newest files are kept. Publishers serialize on a
+lock file, so a manual run and the cron run cannot roll "latest" back.
+`python snapshot_cache.py` serves the cache over HTTP from memory so
+dashboards and bots never have to hit Supabase.
+
+Endpoints:
+    GET /latest                         full snapshot of the newest run
+    GET /latest/tiers/<TIER>            one tier of the newest run
+    GET /snapshots                      list of available asof_ts keys
+    GET /snapshots/<asof_ts>            full snapshot for a timestamp
+    GET /snapshots/<asof_ts>/tiers/<TIER>
+"""
+import fcntl
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from config import (
+    SNAPSHOT_DIR, SNAPSHOT_HOST, SNAPSHOT_PORT, SNAPSHOT_RETENTION, SNAPSHOT_CACHE_SIZE, TIMEFRAME
+)
+
+LATEST_FILE = "latest.json"
+LOCK_FILE = ".publish.lock"
+TIERS = ["LARGE", "MID", "SMALL"]
+RANKED_COLUMNS = ["symbol", "tier", "raw_alpha", "scanner_score", "adv"]
+
+
+def snapshot_key(asof_ts) -> str:
+    """
+    Filename-safe key for a bar timestamp, e.g. 20251219T2000Z.
+    Accepts anything pd.Timestamp understands (ISO strings included).
+    """
+    ts = pd.Timestamp(asof_ts)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.strftime("%Y%m%dT%H%MZ")
+
+
+def _clean(value):
+    """Make a value strict-JSON safe (NaN/inf -> None, numpy -> python)."""
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """Write to a temp file in the same directory, then rename over path."""
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _publish_lock(snapshot_dir: str):
+    """Exclusive lock held for the whole publish (snapshot, pointer, prune)."""
+    with open(os.path.join(snapshot_dir, LOCK_FILE), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def publish_snapshot(
+    output: dict,
+    ranked: pd.DataFrame,
+    last_closed: pd.Timestamp,
+    run_id: str = None,
+    snapshot_dir: str = SNAPSHOT_DIR,
+    retention: int = SNAPSHOT_RETENTION,
+) -> str:
+    """
+    Publish one scanner run to the local snapshot cache.
+
+    Args:
+        output: Result of generate_output ({tier: {long: [...], short: [...]}})
+        ranked: Full ranked table from rank_cross_sectional
+        last_closed: Timestamp of the scan
+        run_id: Supabase run_id, if the run was persisted
+        snapshot_dir: Cache directory
+        retention: Number of snapshot files to keep on disk
+
+    Returns:
+        Path of the written snapshot file, or None if the bar is older than
+        the `retention` newest snapshots and was not written
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    key = snapshot_key(last_closed)
+
+    table = (
+        ranked[RANKED_COLUMNS]
+        .sort_values(["tier", "scanner_score"], ascending=[True, False])
+        .to_dict(orient="records")
+    )
+
+    snapshot = _clean({
+        "asof_ts": last_closed.isoformat(),
+        "key": key,
+        "timeframe": TIMEFRAME,
+        "run_id": run_id,
+        "universe_size": len(ranked),
+        "tiers": output,
+        "ranked": table,
+    })
+
+    filename = f"{key}.json"
+    path = os.path.join(snapshot_dir, filename)
+
+    with _publish_lock(snapshot_dir):
+        # Re-running a bar outside the retention window would be pruned right away
+        newer = [k for k in list_snapshot_keys(snapshot_dir) if k > key]
+        if len(newer) >= retention:
+            print(f"⚠️ Snapshot {key} not published: older than the {retention} retained snapshots")
+            return None
+
+        _atomic_write(path, json.dumps(snapshot).encode())
+
+        # The pointer is rewritten on every publish (readers watch its mtime),
+        # but only moves forward: re-running an older bar must not roll back "latest"
+        pointer = {"asof_ts": snapshot["asof_ts"], "key": key, "file": filename}
+        latest = read_latest_pointer(snapshot_dir)
+        if latest is not None and latest["key"] > key:
+            pointer = latest
+        _atomic_write(os.path.join(snapshot_dir, LATEST_FILE), json.dumps(pointer).encode())
+
+        prune_snapshots(snapshot_dir, keep=retention, protect=pointer["key"])
+
+    print(f"✅ Published snapshot: {path}")
+    return path
+
+
+def list_snapshot_keys(snapshot_dir: str = SNAPSHOT_DIR) -> list:
+    """Return snapshot keys on disk, newest first."""
+    return sorted(
+        (name[:-len(".json")] for name in os.listdir(snapshot_dir)
+         if name.endswith(".json") and name != LATEST_FILE),
+        reverse=True,
+    )
+
+
+def prune_snapshots(snapshot_dir: str = SNAPSHOT_DIR, keep: int = SNAPSHOT_RETENTION, protect: str = None) -> int:
+    """
+    Delete all but the `keep` newest snapshot files (never `protect`).
+
+    Returns:
+        Number of files removed
+    """
+    removed = 0
+    for key in list_snapshot_keys(snapshot_dir)[keep:]:
+        if key == protect:
+            continue
+        try:
+            os.remove(os.path.join(snapshot_dir, f"{key}.json"))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def read_latest_pointer(snapshot_dir: str = SNAPSHOT_DIR):
+    """Return the latest pointer dict, or None if nothing has been published."""
+    try:
+        with open(os.path.join(snapshot_dir, LATEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class SnapshotStore:
+    """
+    In-memory view of the snapshot directory.
+
+    The `cache_size` most recently used snapshots are held in memory (the
+    latest one is loaded eagerly, older ones on request), together with
+    their serialized responses and ETags. The store re-lists the directory
+    only when the latest pointer's mtime changes, so steady-state reads never
+    touch the disk. All state is guarded by one lock because the server
+    handles requests on many threads.
+    """
+
+    def __init__(self, snapshot_dir: str = SNAPSHOT_DIR, cache_size: int = SNAPSHOT_CACHE_SIZE):
+        self.snapshot_dir = snapshot_dir
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._pointer_mtime = None
+        self._latest_key = None
+        self._available = []          # keys on disk, newest first
+        self._cache = OrderedDict()   # key -> (file mtime, snapshot dict), LRU order
+        self._responses = {}          # (key, tier) -> (body, etag)
+
+    def refresh(self) -> None:
+        """Re-list the directory if the latest pointer has moved."""
+        try:
+            mtime = os.stat(os.path.join(self.snapshot_dir, LATEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return
+
+        if mtime == self._pointer_mtime:
+            return
+
+        with self._lock:
+            if mtime == self._pointer_mtime:
+                return
+
+            pointer = read_latest_pointer(self.snapshot_dir)
+            self._available = list_snapshot_keys(self.snapshot_dir)
+
+            # Drop cached snapshots that were pruned or re-published
+            available = set(self._available)
+            for key, (file_mtime, _) in list(self._cache.items()):
+                try:
+                    stale = key not in available or os.stat(self._path(key)).st_mtime_ns != file_mtime
+                except OSError:
+                    stale = True
+                if stale:
+                    self._evict(key)
+
+            self._latest_key = pointer["key"] if pointer else None
+            self._pointer_mtime = mtime
+            if self._latest_key:
+                self._load(self._latest_key)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{key}.json")
+
+    def _evict(self, key: str) -> None:
+        """Forget a snapshot and its serialized responses. Caller holds the lock."""
+        self._cache.pop(key, None)
+        for cache_key in [k for k in self._responses if k[0] == key]:
+            del self._responses[cache_key]
+
+    def _load(self, key: str):
+        """Return a snapshot, reading it from disk if needed. Caller holds the lock."""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key][1]
+
+        if key not in self._available:
+            return None
+
+        path = self._path(key)
+        try:
+            file_mtime = os.stat(path).st_mtime_ns
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[snapshot_error] {key}: {e}")
+            return None
+
+        self._cache[key] = (file_mtime, snapshot)
+        while len(self._cache) > self.cache_size:
+            self._evict(next(iter(self._cache)))
+        return snapshot
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._available)
+
+    def resolve(self, ref: str):
+        """Map "latest", a snapshot key or an ISO timestamp to a snapshot key."""
+        with self._lock:
+            if ref == "latest":
+                return self._latest_key
+            if ref in self._available:
+                return ref
+        try:
+            key = snapshot_key(ref)
+        except (ValueError, TypeError):
+            return None
+        with self._lock:
+            return key if key in self._available else None
+
+    def response(self, key: str, tier: str = None):
+        """
+        Return (body, etag) for a snapshot or one of its tiers,
+        or None if it does not exist.
+        """
+        if tier is not None and tier not in TIERS:
+            return None
+
+        with self._lock:
+            cache_key = (key, tier)
+            if cache_key in self._responses:
+                self._cache.move_to_end(key)
+                return self._responses[cache_key]
+
+            snapshot = self._load(key)
+            if snapshot is None:
+                return None
+
+            if tier is None:
+                payload = snapshot
+            else:
+                payload = {
+                    "asof_ts": snapshot["asof_ts"],
+                    "key": key,
+                    "run_id": snapshot.get("run_id"),
+                    "tier": tier,
+                    "candidates": snapshot["tiers"].get(tier, {"long": [], "short": []}),
+                    "ranked": [r for r in snapshot["ranked"] if r["tier"] == tier],
+                }
+
+            body = json.dumps(payload).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            self._responses[cache_key] = (body, etag)
+            return body, etag
+
+
+class SnapshotHandler(BaseHTTPRequestHandler):
+    store: SnapshotStore = None
+
+    def do_GET(self):
+        self.store.refresh()
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+
+        if parts == ["snapshots"]:
+            body = json.dumps({"latest": self.store.resolve("latest"), "keys": self.store.keys()}).encode()
+            return self._send(200, body)
+
+        if parts[:1] == ["latest"]:
+            ref, rest = "latest", parts[1:]
+        elif parts[:1] == ["snapshots"] and len(parts) >= 2:
+            ref, rest = parts[1], parts[2:]
+        else:
+            return self._send(404, b'{"error": "not found"}')
+
+        if rest and (len(rest) != 2 or rest[0] != "tiers"):
+            return self._send(404, b'{"error": "not found"}')
+        tier = rest[1].upper() if rest else None
+
+        key = self.store.resolve(ref)
+        found = self.store.response(key, tier) if key else None
+        if found is None:
+            return self._send(404, b'{"error": "snapshot not found"}')
+
+        body, etag = found
+        if etag in self.headers.get("If-None-Match", ""):
+            return self._send(304, b"", etag)
+        return self._send(200, body, etag)
+
+    def _send(self, status: int, body: bytes, etag: str = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(host: str = SNAPSHOT_HOST, port: int = SNAPSHOT_PORT, snapshot_dir: str = SNAPSHOT_DIR) -> None:
+    """Serve the snapshot cache over HTTP until interrupted."""
+    SnapshotHandler.store = SnapshotStore(snapshot_dir)
+    SnapshotHandler.store.refresh()
+
+    server = ThreadingHTTPServer((host, port), SnapshotHandler)
+    print(f"Serving snapshots from {snapshot_dir} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()